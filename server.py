@@ -5,18 +5,26 @@ A standalone MCP tool that connects to Dify's PostgreSQL database
 and performs fuzzy search across credential/config tables.
 """
 
-import json
+import asyncio
+import functools
+import hmac
 import os
-from contextlib import asynccontextmanager
+import re
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from contextlib import aclosing, asynccontextmanager, suppress
 from dataclasses import dataclass
 
 import asyncpg
+import orjson
 import uvicorn
 from mcp.server.fastmcp import FastMCP
 from starlette.applications import Starlette
 from starlette.middleware import Middleware
-from starlette.responses import JSONResponse
-from starlette.routing import Mount
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
 
 # ---------------------------------------------------------------------------
 # Database helper
@@ -31,10 +39,35 @@ class DbConfig:
     database: str
 
 
+def _get_db_config() -> DbConfig:
+    """Build DbConfig from the server's environment variables."""
+    return DbConfig(
+        host=os.environ.get("DB_HOST", "localhost"),
+        port=int(os.environ.get("DB_PORT", "5432")),
+        user=os.environ.get("DB_USER", "postgres"),
+        password=os.environ.get("DB_PASSWORD", ""),
+        database=os.environ.get("DB_DATABASE", "dify"),
+    )
+
+
+# Resolved once at import; the environment does not change while serving.
+DB_CONFIG = _get_db_config()
+
+# Use the optional workflows.graph_tsv full-text column (sql/graph_tsv.sql)
+# to pre-filter graphs instead of a substring scan.
+GRAPH_TSV_ENABLED = os.environ.get("GRAPH_TSV_ENABLED", "").lower() in ("1", "true", "yes")
+
 _pool: asyncpg.Pool | None = None
 
 
-async def get_pool(cfg: DbConfig) -> asyncpg.Pool:
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Decode UUID columns as plain strings so rows serialize as-is."""
+    await conn.set_type_codec(
+        "uuid", encoder=str, decoder=str, schema="pg_catalog", format="text"
+    )
+
+
+async def open_pool(cfg: DbConfig) -> asyncpg.Pool:
     global _pool
     if _pool is None:
         _pool = await asyncpg.create_pool(
@@ -43,8 +76,12 @@ async def get_pool(cfg: DbConfig) -> asyncpg.Pool:
             user=cfg.user,
             password=cfg.password,
             database=cfg.database,
-            min_size=1,
-            max_size=5,
+            min_size=4,
+            max_size=32,
+            command_timeout=15,
+            statement_cache_size=1024,
+            max_cached_statement_lifetime=0,
+            init=_init_connection,
         )
     return _pool
 
@@ -56,13 +93,313 @@ async def close_pool():
         _pool = None
 
 
+# ---------------------------------------------------------------------------
+# SQL
+# ---------------------------------------------------------------------------
+# Kept as module-level constants so every call sends byte-identical query
+# text, which lets asyncpg's per-connection statement cache reuse the
+# prepared statement instead of re-parsing it.
+
+SQL_PROVIDER_MODEL_CREDENTIALS = """
+    SELECT provider_name, model_name, created_at, updated_at
+    FROM provider_model_credentials
+    WHERE LOWER(encrypted_config) LIKE LOWER($1)
+       OR LOWER(credential_name) LIKE LOWER($1)
+    ORDER BY updated_at DESC
+    LIMIT 50
+"""
+
+SQL_TOOL_BUILTIN_PROVIDERS = """
+    SELECT provider, created_at, updated_at
+    FROM tool_builtin_providers
+    WHERE LOWER(encrypted_credentials) LIKE LOWER($1)
+    ORDER BY updated_at DESC
+    LIMIT 50
+"""
+
+SQL_WORKFLOW_ENV_VARS = """
+    SELECT DISTINCT ON (w.app_id)
+           w.app_id, w.created_at, w.updated_at
+    FROM workflows w
+    WHERE LOWER(w.environment_variables) LIKE LOWER($1)
+    ORDER BY w.app_id, w.updated_at DESC
+    LIMIT 50
+"""
+
+# Rows fetched per round-trip when streaming workflow node results through
+# a server-side cursor, so the driver never buffers the whole result set.
+WORKFLOW_PREFETCH = 64
+
+# Latest workflow per app (draft preferred, then most recently updated).
+# The ranking only carries the narrow key columns, so the sort never has
+# to move graph values around; graph is read for the winning rows only.
+# latest_workflows is NOT MATERIALIZED so a query that references it more
+# than once still gets the graph predicate pushed into the workflows scan
+# (and its pg_trgm / tsvector index) instead of filtering a tuplestore.
+_SQL_LATEST_WORKFLOWS = """ranked_workflows AS (
+        SELECT w.id,
+               row_number() OVER (
+                   PARTITION BY w.app_id
+                   ORDER BY (w.version = 'draft') DESC, w.updated_at DESC
+               ) AS rn
+        FROM workflows w
+    ),
+    latest_workflows AS NOT MATERIALIZED (
+        SELECT w.id,
+               w.app_id,
+               a.name AS app_name,
+               {graph_columns},
+               w.version,
+               w.created_at,
+               w.updated_at
+        FROM ranked_workflows r
+        JOIN workflows w ON w.id = r.id
+        LEFT JOIN apps a ON a.id = w.app_id
+        WHERE r.rn = 1
+    )"""
+
+# Only the node fields the tools report are sent back; prompts, variables
+# and other node configuration can be far larger than the match itself.
+_SQL_NODE_SUMMARY = """jsonb_strip_nulls(jsonb_build_object(
+               'id', n.node -> 'id',
+               'data', jsonb_build_object(
+                   'type', n.node -> 'data' -> 'type',
+                   'title', n.node -> 'data' -> 'title',
+                   'provider_id', n.node -> 'data' -> 'provider_id',
+                   'tool_name', n.node -> 'data' -> 'tool_name',
+                   'provider', n.node -> 'data' -> 'provider',
+                   'model', CASE jsonb_typeof(n.node -> 'data' -> 'model')
+                       WHEN 'object' THEN jsonb_build_object(
+                           'name', n.node -> 'data' -> 'model' -> 'name',
+                           'provider', n.node -> 'data' -> 'model' -> 'provider'
+                       )
+                       ELSE n.node -> 'data' -> 'model'
+                   END
+               )
+           )) AS node"""
+
+# Latest workflow per app whose graph matches $1.
+_SQL_MATCHED_WORKFLOWS = """
+    WITH {latest_workflows},
+    matched AS (
+        SELECT * FROM latest_workflows
+        WHERE {match_1}
+        ORDER BY app_id
+        LIMIT 50
+    )"""
+
+# Every latest workflow whose graph matches $1, with no workflow limit; used
+# by the NDJSON streams, whose readers want the whole result.
+_SQL_ALL_MATCHED_WORKFLOWS = """
+    WITH {latest_workflows},
+    matched AS (
+        SELECT * FROM latest_workflows
+        WHERE {match_1}
+    )"""
+
+# Plugin ($1) and LLM ($2) search in one round-trip. Each keyword keeps its
+# own 50-workflow limit, picked the same way as in the single-keyword
+# query; hit_plugin / hit_llm say which keyword(s) a workflow counts
+# toward, so only its tool nodes, llm nodes or both are returned.
+_SQL_MATCHED_TOOL_AND_LLM_WORKFLOWS = """
+    WITH {latest_workflows},
+    plugin_hits AS (
+        SELECT * FROM latest_workflows
+        WHERE {match_1}
+        ORDER BY app_id
+        LIMIT 50
+    ),
+    llm_hits AS (
+        SELECT * FROM latest_workflows
+        WHERE {match_2}
+        ORDER BY app_id
+        LIMIT 50
+    ),
+    matched AS (
+        SELECT COALESCE(p.id, l.id) AS id,
+               COALESCE(p.app_id, l.app_id) AS app_id,
+               COALESCE(p.app_name, l.app_name) AS app_name,
+               COALESCE(p.graph, l.graph) AS graph,
+               COALESCE(p.version, l.version) AS version,
+               COALESCE(p.updated_at, l.updated_at) AS updated_at,
+               p.app_id IS NOT NULL AS hit_plugin,
+               l.app_id IS NOT NULL AS hit_llm
+        FROM plugin_hits p
+        FULL JOIN llm_hits l ON l.app_id = p.app_id
+    )"""
+
+# One row per node of the given type in the matched workflows. The last
+# parameter lists app ids whose graph PostgreSQL rejects as jsonb (invalid
+# JSON, or a `\u0000` escape): `::jsonb` would raise for those and abort
+# the statement, so they get a NULL graph (and no nodes) instead; see
+# _iter_node_rows. Rows come in (app_id, ord) order, ord being the node's
+# position in the graph, so a re-run can resume after the last row seen.
+_SQL_NODE_ROWS = """
+    SELECT m.app_id,
+           m.app_name,
+           m.version,
+           m.updated_at,
+           n.ord,
+           {node_summary}
+    FROM matched m
+    CROSS JOIN LATERAL jsonb_path_query(
+        CASE WHEN m.app_id = ANY($2) THEN NULL ELSE m.graph::jsonb END,
+        '$.nodes[*] ? (@.data.type == "{node_type}")'
+    ) WITH ORDINALITY AS n(node, ord)
+    ORDER BY m.app_id, n.ord
+"""
+
+_SQL_TOOL_AND_LLM_NODE_ROWS = """
+    SELECT m.app_id,
+           m.app_name,
+           m.version,
+           m.updated_at,
+           n.ord,
+           {node_summary}
+    FROM matched m
+    CROSS JOIN LATERAL jsonb_path_query(
+        CASE WHEN m.app_id = ANY($3) THEN NULL ELSE m.graph::jsonb END,
+        '$.nodes[*] ? (@.data.type == "tool" || @.data.type == "llm")'
+    ) WITH ORDINALITY AS n(node, ord)
+    WHERE (n.node -> 'data' ->> 'type' = 'tool' AND m.hit_plugin)
+       OR (n.node -> 'data' ->> 'type' = 'llm' AND m.hit_llm)
+    ORDER BY m.app_id, n.ord
+"""
+
+# Ids of the matched workflows, read only when a node query failed on the
+# cast, to find the workflows to leave out.
+_SQL_MATCHED_IDS = """
+    SELECT m.id, m.app_id FROM matched m
+"""
+
+# Graph keyword predicates. The tsvector form needs the optional
+# workflows.graph_tsv column from sql/graph_tsv.sql and takes the raw
+# keyword instead of a %pattern%. Every lexeme of the keyword is turned
+# into a prefix match (`'deep':*`), so `deep` still finds `deepseek-chat`.
+_GRAPH_MATCH_ILIKE = "graph ILIKE ${}"
+_GRAPH_MATCH_TSV = (
+    "graph_tsv @@ regexp_replace("
+    "plainto_tsquery('simple', ${})::text, '''( |$)', ''':*\\1', 'g'"
+    ")::tsquery"
+)
+
+
+@dataclass(frozen=True)
+class WorkflowQuery:
+    """A workflow node query and the id query over the same matched workflows."""
+
+    nodes: str
+    matched_ids: str
+
+
+def _workflow_sql(matched: str, rows: str, *use_tsv: bool, **fields: str) -> WorkflowQuery:
+    """Fill in a workflow query template; use_tsv picks the graph filter per keyword."""
+    graph_columns = "w.graph, w.graph_tsv" if any(use_tsv) else "w.graph"
+    matches = {
+        f"match_{n}": (_GRAPH_MATCH_TSV if tsv else _GRAPH_MATCH_ILIKE).format(n)
+        for n, tsv in enumerate(use_tsv, 1)
+    }
+    params = {
+        "latest_workflows": _SQL_LATEST_WORKFLOWS.format(graph_columns=graph_columns),
+        "node_summary": _SQL_NODE_SUMMARY,
+        **matches,
+        **fields,
+    }
+    return WorkflowQuery(
+        nodes=(matched + rows).format(**params),
+        matched_ids=(matched + _SQL_MATCHED_IDS).format(**params),
+    )
+
+
+SQL_WORKFLOW_TOOL_NODES = _workflow_sql(
+    _SQL_MATCHED_WORKFLOWS, _SQL_NODE_ROWS, False, node_type="tool"
+)
+SQL_WORKFLOW_LLM_NODES = _workflow_sql(
+    _SQL_MATCHED_WORKFLOWS, _SQL_NODE_ROWS, False, node_type="llm"
+)
+SQL_WORKFLOW_TOOL_NODES_TSV = _workflow_sql(
+    _SQL_MATCHED_WORKFLOWS, _SQL_NODE_ROWS, True, node_type="tool"
+)
+SQL_WORKFLOW_LLM_NODES_TSV = _workflow_sql(
+    _SQL_MATCHED_WORKFLOWS, _SQL_NODE_ROWS, True, node_type="llm"
+)
+
+# Uncapped variants for the NDJSON streams.
+SQL_STREAM_TOOL_NODES = _workflow_sql(
+    _SQL_ALL_MATCHED_WORKFLOWS, _SQL_NODE_ROWS, False, node_type="tool"
+)
+SQL_STREAM_LLM_NODES = _workflow_sql(
+    _SQL_ALL_MATCHED_WORKFLOWS, _SQL_NODE_ROWS, False, node_type="llm"
+)
+SQL_STREAM_TOOL_NODES_TSV = _workflow_sql(
+    _SQL_ALL_MATCHED_WORKFLOWS, _SQL_NODE_ROWS, True, node_type="tool"
+)
+SQL_STREAM_LLM_NODES_TSV = _workflow_sql(
+    _SQL_ALL_MATCHED_WORKFLOWS, _SQL_NODE_ROWS, True, node_type="llm"
+)
+
+# Keyed by (plugin keyword uses tsv, model keyword uses tsv), so each keyword
+# gets the same filter as in its single-keyword query.
+SQL_WORKFLOW_TOOL_AND_LLM_NODES = {
+    modes: _workflow_sql(_SQL_MATCHED_TOOL_AND_LLM_WORKFLOWS, _SQL_TOOL_AND_LLM_NODE_ROWS, *modes)
+    for modes in ((False, False), (False, True), (True, False), (True, True))
+}
+
+
+# ---------------------------------------------------------------------------
+# Response cache
+# ---------------------------------------------------------------------------
+# The tools are read-only searches and the same keywords come up again and
+# again, so a short-lived cache lets repeats skip the database entirely.
+
+CACHE_TTL_SECONDS = 30
+CACHE_MAX_ENTRIES = 256
+
+_cache: OrderedDict[tuple, tuple[float, str]] = OrderedDict()
+
+
+def _cached(fn):
+    """Cache a tool's response per arguments, LRU-bounded with a TTL."""
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+
+        hit = _cache.get(key)
+        if hit is not None and now - hit[0] < CACHE_TTL_SECONDS:
+            _cache.move_to_end(key)
+            return hit[1]
+
+        result = await fn(*args, **kwargs)
+        _cache[key] = (now, result)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+        return result
+
+    return wrapper
+
+
 # ---------------------------------------------------------------------------
 # MCP Server
 # ---------------------------------------------------------------------------
 
 @asynccontextmanager
 async def server_lifespan(server: FastMCP):
+    """Make sure the connection pool is open for the MCP session.
+
+    FastMCP enters this once per client session, so the pool itself is owned
+    by the Starlette app's lifespan and is not closed here.
+    """
+    await open_pool(DB_CONFIG)
+    yield
+
+
+@asynccontextmanager
+async def app_lifespan(app: Starlette):
     """Manage connection pool lifecycle."""
+    await open_pool(DB_CONFIG)
     yield
     await close_pool()
 
@@ -76,96 +413,78 @@ mcp = FastMCP(
 )
 
 
-def _get_db_config() -> DbConfig:
-    """Build DbConfig from the server's initialization options."""
-    import os
+def _format_rows(rows: list[asyncpg.Record]) -> list[dict]:
+    """Convert asyncpg records to list of dicts."""
+    return [dict(row) for row in rows]
 
-    return DbConfig(
-        host=os.environ.get("DB_HOST", "localhost"),
-        port=int(os.environ.get("DB_PORT", "5432")),
-        user=os.environ.get("DB_USER", "postgres"),
-        password=os.environ.get("DB_PASSWORD", ""),
-        database=os.environ.get("DB_DATABASE", "dify"),
-    )
 
+# Hand datetimes to default=str so they keep their str() form
+# (`2024-05-01 10:00:00.123456`) instead of orjson's ISO 8601.
+_JSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
 
-def _format_rows(rows: list[asyncpg.Record], columns: list[str]) -> list[dict]:
-    """Convert asyncpg records to list of dicts with selected columns."""
-    results = []
-    for row in rows:
-        item = {}
-        for col in columns:
-            val = row[col]
-            if isinstance(val, (dict, list)):
-                item[col] = val
-            else:
-                item[col] = str(val) if val is not None else None
-        results.append(item)
-    return results
+
+def _to_json(output: dict) -> str:
+    """Serialize a tool response to compact JSON (clients pretty-print if needed)."""
+    return orjson.dumps(output, default=str, option=_JSON_OPTIONS).decode()
+
+
+# Keywords the tsvector filter handles predictably. The text search parser
+# splits hyphens and dots inconsistently (`gpt-4` parses as `gpt` & `-4`,
+# while `gpt-4o` in a graph stays `gpt-4o`), so anything else, including
+# `%` wildcards, goes through ILIKE.
+_TSV_KEYWORD_RE = re.compile(r"[A-Za-z0-9_]+")
+
+
+def _use_graph_tsv(keyword: str) -> bool:
+    """Whether a graph search for this keyword can use the tsvector column.
+
+    Token mode matches whole-word prefixes only: `deep` finds `deepseek`,
+    but `seek` does not, nor does `anthropic` inside a single path token
+    like `langgenius/anthropic/anthropic`.
+    """
+    return GRAPH_TSV_ENABLED and _TSV_KEYWORD_RE.fullmatch(keyword) is not None
+
+
+def _graph_arg(keyword: str, use_tsv: bool) -> str:
+    """Query argument for a graph keyword under the chosen filter."""
+    return keyword if use_tsv else f"%{keyword}%"
 
 
 @mcp.tool()
+@_cached
 async def search_dify_credentials(keyword: str) -> str:
     """
     根据关键字模糊搜索 Dify 数据库中的凭据和环境变量配置。
     Args:
         keyword: 用于模糊搜索的关键字
     """
-    cfg = _get_db_config()
-    pool = await get_pool(cfg)
+    pool = _pool
 
     pattern = f"%{keyword}%"
     results: dict[str, list] = {}
 
-    async with pool.acquire() as conn:
+    async def _q1():
         # 1. provider_model_credentials
-        rows = await conn.fetch(
-            """
-            SELECT provider_name, model_name, created_at, updated_at
-            FROM provider_model_credentials
-            WHERE encrypted_config ILIKE $1 OR credential_name ILIKE $1
-            ORDER BY updated_at DESC
-            LIMIT 50
-            """,
-            pattern,
-        )
-        results["provider_model_credentials"] = _format_rows(
-            rows,
-            ["provider_name", "model_name", "created_at", "updated_at"],
-        )
+        async with pool.acquire() as conn:
+            return await conn.fetch(SQL_PROVIDER_MODEL_CREDENTIALS, pattern)
 
+    async def _q2():
         # 2. tool_builtin_providers
-        rows = await conn.fetch(
-            """
-            SELECT provider, created_at, updated_at
-            FROM tool_builtin_providers
-            WHERE encrypted_credentials ILIKE $1
-            ORDER BY updated_at DESC
-            LIMIT 50
-            """,
-            pattern,
-        )
-        results["tool_builtin_providers"] = _format_rows(
-            rows,
-            ["provider", "created_at", "updated_at"],
-        )
+        async with pool.acquire() as conn:
+            return await conn.fetch(SQL_TOOL_BUILTIN_PROVIDERS, pattern)
 
+    async def _q3():
         # 3. workflows (deduplicated by app_id, keep latest)
-        rows = await conn.fetch(
-            """
-            SELECT DISTINCT ON (w.app_id)
-                   w.app_id, w.created_at, w.updated_at
-            FROM workflows w
-            WHERE w.environment_variables ILIKE $1
-            ORDER BY w.app_id, w.updated_at DESC
-            LIMIT 50
-            """,
-            pattern,
-        )
-        results["workflows"] = _format_rows(
-            rows,
-            ["app_id", "created_at", "updated_at"],
-        )
+        async with pool.acquire() as conn:
+            return await conn.fetch(SQL_WORKFLOW_ENV_VARS, pattern)
+
+    # The three lookups are independent, so run them on separate
+    # connections concurrently instead of back to back.
+    rows1, rows2, rows3 = await asyncio.gather(_q1(), _q2(), _q3())
+
+    results["provider_model_credentials"] = _format_rows(rows1)
+    results["tool_builtin_providers"] = _format_rows(rows2)
+    results["workflows"] = _format_rows(rows3)
 
     # Build summary
     summary_parts = []
@@ -177,10 +496,152 @@ async def search_dify_credentials(keyword: str) -> str:
         "keyword": keyword,
         "results": results,
     }
-    return json.dumps(output, ensure_ascii=False, default=str, indent=2)
+    return _to_json(output)
+
+
+# Shared stand-in for a missing node "data" object; never mutated.
+_EMPTY: dict = {}
+
+
+def _match_tool_node(node: dict, keyword_lower: str) -> dict | None:
+    """Return the tool node's details if it matches the keyword."""
+    data = node.get("data") or _EMPTY
+
+    provider_id = data.get("provider_id", "")
+    tool_name = data.get("tool_name", "")
+
+    # Check if the keyword matches provider_id or tool_name. Both are
+    # lowered in one pass; the NUL separator keeps a match from
+    # spanning the two fields.
+    if keyword_lower not in f"{provider_id}\0{tool_name}".lower():
+        return None
+
+    return {
+        "node_id": node.get("id", ""),
+        "node_title": data.get("title", ""),
+        "provider_id": provider_id,
+        "tool_name": tool_name,
+    }
+
+
+def _match_llm_node(node: dict, keyword_lower: str) -> dict | None:
+    """Return the LLM node's details if it matches the keyword."""
+    data = node.get("data") or _EMPTY
+
+    model = data.get("model")
+    if isinstance(model, dict):
+        model_name, provider = model.get("name", ""), model.get("provider", "")
+    else:
+        model_name = str(model if model is not None else "")
+        provider = str(data.get("provider", ""))
+
+    # Check if the keyword matches model name or provider
+    if keyword_lower not in f"{model_name}\0{provider}".lower():
+        return None
+
+    return {
+        "node_id": node.get("id", ""),
+        "node_title": data.get("title", ""),
+        "model": model_name,
+        "provider": provider,
+    }
+
+
+def _app_entry(row: asyncpg.Record) -> dict:
+    """Workflow fields reported alongside its matching nodes."""
+    return {
+        "app_id": row["app_id"],
+        "app_name": row["app_name"] or "",
+        "version": row["version"] or "",
+        "updated_at": row["updated_at"],
+    }
+
+
+def _add_match(
+    results_by_app: dict[str, dict],
+    row: asyncpg.Record,
+    key: str,
+    match: dict,
+) -> None:
+    """Append a matching node to its workflow's entry, creating it on first use."""
+    app_id = row["app_id"]
+    entry = results_by_app.get(app_id)
+    if entry is None:
+        entry = results_by_app[app_id] = _app_entry(row)
+        entry[key] = []
+    entry[key].append(match)
+
+
+# Casts one workflow's graph the way the node queries do, to find out
+# whether PostgreSQL accepts it as jsonb. The graph never leaves the server.
+_SQL_GRAPH_CAST = "SELECT graph::jsonb IS NOT NULL FROM workflows WHERE id = $1"
+
+
+async def _unparsable_graphs(conn: asyncpg.Connection, sql: str, *args) -> list[str]:
+    """App ids among the matched workflows whose graph PostgreSQL cannot cast to jsonb.
+
+    Each graph is cast on its own by the server, so the check agrees with
+    the node query on what counts as broken (e.g. a `\\u0000` escape).
+    """
+    bad = []
+    for row in await conn.fetch(sql, *args):
+        try:
+            await conn.fetchval(_SQL_GRAPH_CAST, row["id"])
+        except asyncpg.DataError:
+            bad.append(row["app_id"])
+    return bad
+
+
+async def _iter_node_rows(
+    conn: asyncpg.Connection, query: WorkflowQuery, *args
+) -> AsyncIterator[asyncpg.Record]:
+    """Yield the node rows of a workflow query, skipping unparsable graphs.
+
+    If the graph cast fails, PostgreSQL checks the matched graphs one by one
+    and the query is re-run with the broken workflows left out, resuming
+    after the last (app_id, ord) yielded. The re-run sees a fresh snapshot,
+    so rows are skipped by key rather than by count: a workflow saved in
+    between cannot shift rows into or out of the part already yielded.
+    """
+    skip: list[str] = []
+    last: tuple[str, int] | None = None
+    while True:
+        try:
+            async with conn.transaction(readonly=True):
+                async for row in conn.cursor(query.nodes, *args, skip, prefetch=WORKFLOW_PREFETCH):
+                    # app_id is a canonical lowercase uuid string, so it
+                    # compares in the same order as the uuid ORDER BY.
+                    key = (row["app_id"], row["ord"])
+                    if last is None or key > last:
+                        last = key
+                        yield row
+            return
+        except asyncpg.DataError:
+            bad = await _unparsable_graphs(conn, query.matched_ids, *args)
+            if not set(bad).difference(skip):
+                raise
+            skip = [*skip, *(app_id for app_id in bad if app_id not in skip)]
+
+
+async def _iter_node_matches(
+    conn: asyncpg.Connection,
+    query: WorkflowQuery,
+    arg: str,
+    matcher: Callable[[dict, str], dict | None],
+    keyword_lower: str,
+) -> AsyncIterator[tuple[asyncpg.Record, dict]]:
+    """Yield (row, match) for each node row the matcher accepts, as it arrives."""
+    # Closing this generator must also end the read-only transaction held
+    # by the row generator, before the connection goes back to the pool.
+    async with aclosing(_iter_node_rows(conn, query, arg)) as rows:
+        async for row in rows:
+            match = matcher(orjson.loads(row["node"]), keyword_lower)
+            if match is not None:
+                yield row, match
 
 
 @mcp.tool()
+@_cached
 async def search_workflows_by_plugin(plugin_keyword: str) -> str:
     """
     根据 plugin（插件/工具）名称关键字，搜索哪些 workflow 使用了该 plugin。
@@ -188,91 +649,34 @@ async def search_workflows_by_plugin(plugin_keyword: str) -> str:
     Args:
         plugin_keyword: 用于模糊搜索 plugin 名称的关键字（如 google, dalle, wikipedia）
     """
-    cfg = _get_db_config()
-    pool = await get_pool(cfg)
-
-    pattern = f"%{plugin_keyword}%"
-
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            WITH latest_workflows AS (
-                SELECT DISTINCT ON (w.app_id)
-                       w.app_id,
-                       a.name AS app_name,
-                       w.graph,
-                       w.version,
-                       w.created_at,
-                       w.updated_at
-                FROM workflows w
-                LEFT JOIN apps a ON a.id = w.app_id
-                ORDER BY w.app_id,
-                         (w.version = 'draft') DESC,
-                         w.updated_at DESC
-            )
-            SELECT * FROM latest_workflows
-            WHERE graph ILIKE $1
-            LIMIT 50
-            """,
-            pattern,
-        )
+    pool = _pool
+
+    use_tsv = _use_graph_tsv(plugin_keyword)
+    query = SQL_WORKFLOW_TOOL_NODES_TSV if use_tsv else SQL_WORKFLOW_TOOL_NODES
+    arg = _graph_arg(plugin_keyword, use_tsv)
 
-    # Parse graph JSON and extract matching tool nodes
+    # One row per tool node, trimmed to the reported fields
     keyword_lower = plugin_keyword.lower()
-    results = []
+    results_by_app: dict[str, dict] = {}
 
-    for row in rows:
-        graph_str = row["graph"]
-        if not graph_str:
-            continue
+    async with pool.acquire() as conn, aclosing(
+        _iter_node_matches(conn, query, arg, _match_tool_node, keyword_lower)
+    ) as matches:
+        async for row, match in matches:
+            _add_match(results_by_app, row, "matching_tools", match)
 
-        try:
-            graph = json.loads(graph_str)
-        except (json.JSONDecodeError, TypeError):
-            continue
-
-        nodes = graph.get("nodes", [])
-        matching_tools = []
-
-        for node in nodes:
-            data = node.get("data", {})
-            node_type = data.get("type", "")
-
-            # Only look at tool nodes
-            if node_type != "tool":
-                continue
-
-            provider_id = data.get("provider_id", "")
-            tool_name = data.get("tool_name", "")
-
-            # Check if the keyword matches provider_id or tool_name
-            if (keyword_lower in provider_id.lower()
-                    or keyword_lower in tool_name.lower()):
-                matching_tools.append({
-                    "node_id": node.get("id", ""),
-                    "node_title": data.get("title", node.get("data", {}).get("title", "")),
-                    "provider_id": provider_id,
-                    "tool_name": tool_name,
-                })
-
-        if matching_tools:
-            results.append({
-                "app_id": str(row["app_id"]),
-                "app_name": row["app_name"] or "",
-                "version": row["version"] or "",
-                "matching_tools": matching_tools,
-                "updated_at": str(row["updated_at"]) if row["updated_at"] else None,
-            })
+    results = list(results_by_app.values())
 
     output = {
         "summary": f"找到 {len(results)} 个 workflow 使用了匹配 '{plugin_keyword}' 的 plugin",
         "keyword": plugin_keyword,
         "results": results,
     }
-    return json.dumps(output, ensure_ascii=False, default=str, indent=2)
+    return _to_json(output)
 
 
 @mcp.tool()
+@_cached
 async def search_workflows_by_llm(model_keyword: str) -> str:
     """
     根据大语言模型（LLM）名称关键字，搜索哪些 workflow 使用了该模型。
@@ -280,88 +684,190 @@ async def search_workflows_by_llm(model_keyword: str) -> str:
     Args:
         model_keyword: 用于模糊搜索 LLM 模型名称的关键字（如 gpt-4, claude, deepseek, qwen）
     """
-    cfg = _get_db_config()
-    pool = await get_pool(cfg)
-
-    pattern = f"%{model_keyword}%"
-
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            WITH latest_workflows AS (
-                SELECT DISTINCT ON (w.app_id)
-                       w.app_id,
-                       a.name AS app_name,
-                       w.graph,
-                       w.version,
-                       w.created_at,
-                       w.updated_at
-                FROM workflows w
-                LEFT JOIN apps a ON a.id = w.app_id
-                ORDER BY w.app_id,
-                         (w.version = 'draft') DESC,
-                         w.updated_at DESC
-            )
-            SELECT * FROM latest_workflows
-            WHERE graph ILIKE $1
-            LIMIT 50
-            """,
-            pattern,
-        )
+    pool = _pool
+
+    use_tsv = _use_graph_tsv(model_keyword)
+    query = SQL_WORKFLOW_LLM_NODES_TSV if use_tsv else SQL_WORKFLOW_LLM_NODES
+    arg = _graph_arg(model_keyword, use_tsv)
 
-    # Parse graph JSON and extract matching LLM nodes
+    # One row per LLM node, trimmed to the reported fields
     keyword_lower = model_keyword.lower()
-    results = []
+    results_by_app: dict[str, dict] = {}
 
-    for row in rows:
-        graph_str = row["graph"]
-        if not graph_str:
-            continue
+    async with pool.acquire() as conn, aclosing(
+        _iter_node_matches(conn, query, arg, _match_llm_node, keyword_lower)
+    ) as matches:
+        async for row, match in matches:
+            _add_match(results_by_app, row, "matching_llms", match)
 
-        try:
-            graph = json.loads(graph_str)
-        except (json.JSONDecodeError, TypeError):
-            continue
-
-        nodes = graph.get("nodes", [])
-        matching_llms = []
-
-        for node in nodes:
-            data = node.get("data", {})
-            node_type = data.get("type", "")
-
-            # Only look at LLM nodes
-            if node_type != "llm":
-                continue
-
-            model_name = data.get("model", {}).get("name", "") if isinstance(data.get("model"), dict) else str(data.get("model", ""))
-            provider = data.get("model", {}).get("provider", "") if isinstance(data.get("model"), dict) else str(data.get("provider", ""))
-
-            # Check if the keyword matches model name or provider
-            if (keyword_lower in model_name.lower()
-                    or keyword_lower in provider.lower()):
-                matching_llms.append({
-                    "node_id": node.get("id", ""),
-                    "node_title": data.get("title", ""),
-                    "model": model_name,
-                    "provider": provider,
-                })
-
-        if matching_llms:
-            results.append({
-                "app_id": str(row["app_id"]),
-                "app_name": row["app_name"] or "",
-                "version": row["version"] or "",
-                "matching_llms": matching_llms,
-                "updated_at": str(row["updated_at"]) if row["updated_at"] else None,
-            })
+    results = list(results_by_app.values())
 
     output = {
         "summary": f"找到 {len(results)} 个 workflow 使用了匹配 '{model_keyword}' 的 LLM 模型",
         "keyword": model_keyword,
         "results": results,
     }
-    return json.dumps(output, ensure_ascii=False, default=str, indent=2)
+    return _to_json(output)
+
+
+@mcp.tool()
+@_cached
+async def search_workflows_by_keywords(plugin_keyword: str, model_keyword: str) -> str:
+    """
+    同时按 plugin 关键字和 LLM 模型关键字搜索 workflow，只需一次数据库查询。
+    结果等价于分别调用 search_workflows_by_plugin 和 search_workflows_by_llm。
+    Args:
+        plugin_keyword: 用于模糊搜索 plugin 名称的关键字（如 google, dalle, wikipedia）
+        model_keyword: 用于模糊搜索 LLM 模型名称的关键字（如 gpt-4, claude, deepseek, qwen）
+    """
+    pool = _pool
+
+    # Each keyword picks its own graph filter, as in the single-keyword tools
+    plugin_tsv = _use_graph_tsv(plugin_keyword)
+    model_tsv = _use_graph_tsv(model_keyword)
+    query = SQL_WORKFLOW_TOOL_AND_LLM_NODES[plugin_tsv, model_tsv]
+
+    # The query returns tool nodes of plugin hits and LLM nodes of LLM hits only
+    plugin_lower = plugin_keyword.lower()
+    model_lower = model_keyword.lower()
+    plugin_by_app: dict[str, dict] = {}
+    llm_by_app: dict[str, dict] = {}
+
+    async with pool.acquire() as conn, aclosing(
+        _iter_node_rows(
+            conn,
+            query,
+            _graph_arg(plugin_keyword, plugin_tsv),
+            _graph_arg(model_keyword, model_tsv),
+        )
+    ) as rows:
+        async for row in rows:
+            node = orjson.loads(row["node"])
+            node_type = (node.get("data") or _EMPTY).get("type", "")
+
+            if node_type == "tool":
+                match = _match_tool_node(node, plugin_lower)
+                if match is not None:
+                    _add_match(plugin_by_app, row, "matching_tools", match)
+            else:
+                match = _match_llm_node(node, model_lower)
+                if match is not None:
+                    _add_match(llm_by_app, row, "matching_llms", match)
+
+    plugin_results = list(plugin_by_app.values())
+    llm_results = list(llm_by_app.values())
+
+    output = {
+        "summary": (
+            f"找到 {len(plugin_results)} 个 workflow 使用了匹配 '{plugin_keyword}' 的 plugin"
+            f" | 找到 {len(llm_results)} 个 workflow 使用了匹配 '{model_keyword}' 的 LLM 模型"
+        ),
+        "plugin_keyword": plugin_keyword,
+        "model_keyword": model_keyword,
+        "plugin_results": plugin_results,
+        "llm_results": llm_results,
+    }
+    return _to_json(output)
+
+
+# ---------------------------------------------------------------------------
+# Streaming HTTP endpoints
+# ---------------------------------------------------------------------------
+# Bulk consumers can read workflow matches as NDJSON, one line per matching
+# node, written as soon as the node is filtered instead of after the whole
+# result has been built. Unlike the MCP tools, the streams are not capped at
+# 50 workflows; STREAM_MAX_SECONDS is their only bound.
+#
+# Each open stream pins one pooled connection until it finishes, however
+# slowly the client reads. Streams share a few slots so they can never hold
+# more than STREAM_MAX_CONCURRENT connections (the rest of the pool stays
+# available to the MCP tools), and the whole response, including time spent
+# waiting on a client that stopped reading, is cut off after
+# STREAM_MAX_SECONDS.
+STREAM_MAX_CONCURRENT = 4
+STREAM_MAX_SECONDS = 120
+
+_stream_slots = asyncio.Semaphore(STREAM_MAX_CONCURRENT)
+
+_STREAM_TIMEOUT_LINE = orjson.dumps(
+    {"error": "Timeout", "message": "Stream time limit reached"}
+) + b"\n"
+
+
+class _SlotStreamingResponse(StreamingResponse):
+    """StreamingResponse that owns a stream slot and runs for a bounded time."""
+
+    async def __call__(self, scope, receive, send):
+        try:
+            async with asyncio.timeout(STREAM_MAX_SECONDS):
+                await super().__call__(scope, receive, send)
+        except TimeoutError:
+            # Tell a client that is still reading why the stream ended;
+            # give up quickly on one that is not.
+            with suppress(TimeoutError, OSError):
+                async with asyncio.timeout(1):
+                    await send({
+                        "type": "http.response.body",
+                        "body": _STREAM_TIMEOUT_LINE,
+                        "more_body": False,
+                    })
+        finally:
+            # Also runs when the body was never iterated, so the slot and
+            # any pooled connection are always given back.
+            await self.body_iterator.aclose()
+            _stream_slots.release()
+
+
+def _node_stream_endpoint(
+    query_ilike: WorkflowQuery,
+    query_tsv: WorkflowQuery,
+    matcher: Callable[[dict, str], dict | None],
+    key: str,
+):
+    """Build a Starlette endpoint streaming node matches for ?keyword=..."""
+
+    async def endpoint(request: Request) -> Response:
+        keyword = request.query_params.get("keyword", "")
+        if not keyword:
+            return JSONResponse(
+                {"error": "Bad Request", "message": "Missing keyword parameter"},
+                status_code=400,
+            )
+
+        use_tsv = _use_graph_tsv(keyword)
+        query = query_tsv if use_tsv else query_ilike
+        arg = _graph_arg(keyword, use_tsv)
+        keyword_lower = keyword.lower()
+
+        async def lines() -> AsyncIterator[bytes]:
+            async with _pool.acquire() as conn, aclosing(
+                _iter_node_matches(conn, query, arg, matcher, keyword_lower)
+            ) as matches:
+                async for row, match in matches:
+                    item = _app_entry(row)
+                    item[key] = match
+                    yield orjson.dumps(item, default=str, option=_JSON_OPTIONS) + b"\n"
+
+        # Take the slot before any response is sent; with a free slot the
+        # acquire does not suspend, so the check and the acquire are atomic.
+        if _stream_slots.locked():
+            return JSONResponse(
+                {"error": "Service Unavailable", "message": "Too many open streams"},
+                status_code=503,
+                headers={"Retry-After": "5"},
+            )
+        await _stream_slots.acquire()
+        return _SlotStreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return endpoint
+
+
+stream_workflows_by_plugin = _node_stream_endpoint(
+    SQL_STREAM_TOOL_NODES, SQL_STREAM_TOOL_NODES_TSV, _match_tool_node, "matching_tool"
+)
+stream_workflows_by_llm = _node_stream_endpoint(
+    SQL_STREAM_LLM_NODES, SQL_STREAM_LLM_NODES_TSV, _match_llm_node, "matching_llm"
+)
 
 
 # ---------------------------------------------------------------------------
@@ -374,6 +880,8 @@ class APIKeyAuthMiddleware:
     def __init__(self, app):
         self.app = app
         self.api_key = os.environ.get("MCP_API_KEY", "")
+        # Expected raw header value, built once instead of per request
+        self._expected = f"Bearer {self.api_key}".encode() if self.api_key else None
 
     async def __call__(self, scope, receive, send):
         if scope["type"] not in ("http", "websocket"):
@@ -381,23 +889,23 @@ class APIKeyAuthMiddleware:
             return
 
         # If no API key is configured, skip authentication
-        if not self.api_key:
+        if self._expected is None:
             await self.app(scope, receive, send)
             return
 
-        # Extract Authorization header
-        headers = dict(scope.get("headers", []))
-        auth_value = headers.get(b"authorization", b"").decode()
-
-        if auth_value != f"Bearer {self.api_key}":
-            response = JSONResponse(
-                {"error": "Unauthorized", "message": "Invalid or missing API key"},
-                status_code=401,
-            )
-            await response(scope, receive, send)
-            return
-
-        await self.app(scope, receive, send)
+        # Compare the raw Authorization header in constant time
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                if hmac.compare_digest(value, self._expected):
+                    await self.app(scope, receive, send)
+                    return
+                break
+
+        response = JSONResponse(
+            {"error": "Unauthorized", "message": "Invalid or missing API key"},
+            status_code=401,
+        )
+        await response(scope, receive, send)
 
 
 # ---------------------------------------------------------------------------
@@ -408,10 +916,15 @@ if __name__ == "__main__":
     # Get the underlying SSE Starlette app from FastMCP
     mcp_sse_app = mcp.sse_app()
 
-    # Wrap it with auth middleware
+    # Wrap it with auth middleware, next to the NDJSON streaming endpoints
     app = Starlette(
-        routes=[Mount("/", app=mcp_sse_app)],
+        routes=[
+            Route("/stream/workflows/plugin", stream_workflows_by_plugin),
+            Route("/stream/workflows/llm", stream_workflows_by_llm),
+            Mount("/", app=mcp_sse_app),
+        ],
         middleware=[Middleware(APIKeyAuthMiddleware)],
+        lifespan=app_lifespan,
     )
 
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,31 @@
+-- Optional full-text column for the workflow plugin / LLM searches.
+--
+-- Plugin and model keywords are word-shaped (google, claude, deepseek), so a
+-- GIN index over a tsvector of the graph turns the substring scan into an
+-- indexed token-prefix lookup. After applying this file, start the server
+-- with GRAPH_TSV_ENABLED=true to use it. Only keywords made of letters,
+-- digits and `_` use it; anything else (gpt-4, qwen2.5, `%` wildcards)
+-- still uses the ILIKE filter.
+--
+-- `/` is turned into a space before parsing. Otherwise the parser keeps
+-- plugin paths such as `langgenius/openai/openai` as one token, and a search
+-- for `openai` would miss every plugin-era graph.
+--
+-- Unlike sql/indexes.sql this changes the workflows table schema:
+--   * ADD COLUMN ... STORED rewrites the table under an ACCESS EXCLUSIVE
+--     lock, so apply it during a maintenance window.
+--   * A tsvector is limited to 1MB; a graph that exceeds it will make the
+--     INSERT / UPDATE fail. Check the largest graphs before applying.
+--   * Dify's own migrations do not know about this column.
+--   * If an earlier version of this file was applied, drop the column
+--     first (ALTER TABLE workflows DROP COLUMN graph_tsv) so it is
+--     re-created with the current expression.
+--
+--   psql -h <host> -U postgres -d dify -f sql/graph_tsv.sql
+
+ALTER TABLE workflows
+    ADD COLUMN IF NOT EXISTS graph_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', translate(graph, '/', ' '))) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wf_graph_tsv
+    ON workflows USING gin (graph_tsv);
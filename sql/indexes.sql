@@ -0,0 +1,39 @@
+-- Optional indexes for the Dify database used by dify-db-search-mcp.
+--
+-- Every search runs a `'%keyword%'` substring match against wide text
+-- columns. A leading wildcard cannot use a B-tree index, so without these
+-- indexes each search is a full sequential scan. pg_trgm GIN indexes let the
+-- planner answer the substring match with a trigram index scan instead.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so run
+-- this file with autocommit (the psql default), e.g.:
+--
+--   psql -h <host> -U postgres -d dify -f sql/indexes.sql
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- search_dify_credentials
+--
+-- These searches match `LOWER(col) LIKE LOWER($1)`, so the trigram indexes
+-- are built on the same LOWER(...) expression for the planner to use them.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pmc_encrypted_config_lower_trgm
+    ON provider_model_credentials USING gin (LOWER(encrypted_config) gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pmc_credential_name_lower_trgm
+    ON provider_model_credentials USING gin (LOWER(credential_name) gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tbp_encrypted_credentials_lower_trgm
+    ON tool_builtin_providers USING gin (LOWER(encrypted_credentials) gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wf_environment_variables_lower_trgm
+    ON workflows USING gin (LOWER(environment_variables) gin_trgm_ops);
+
+-- search_workflows_by_plugin / search_workflows_by_llm
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wf_graph_trgm
+    ON workflows USING gin (graph gin_trgm_ops);
+
+-- Latest workflow per app: matches the row_number() ordering used by the
+-- workflow searches, so the window is computed from an index scan
+-- instead of sorting the whole table.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_wf_app_latest
+    ON workflows (app_id, (version = 'draft') DESC, updated_at DESC);